@@ -1,115 +1,378 @@
 """AI-powered code review agent using Google Gemini API."""
 
+import ast
 import asyncio
+import hashlib
 import json
 import logging
+import math
 import os
+import re
+import shelve
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 import google.generativeai as genai
-import aiofiles
-import chardet
+from google.api_core import retry as retries
 import fnmatch
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from rich.console import Console
 from rich.logging import RichHandler
 
 # Fix imports for both direct execution and package import
 try:
     from .tools import CodeAnalysisTools
-    from .prompts import SYSTEM_PROMPT
+    from .prompts import PROMPT_VERSION, SYSTEM_PROMPT
 except ImportError:
     src_path = Path(__file__).parent.parent
     if str(src_path) not in os.sys.path:
         os.sys.path.insert(0, str(src_path))
     from codereview.tools import CodeAnalysisTools
-    from codereview.prompts import SYSTEM_PROMPT
+    from codereview.prompts import PROMPT_VERSION, SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 console = Console()
 
+# Configure logging once at import, leaving any handlers set up by an embedding app alone
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(rich_tracebacks=True)]
+    )
+
+# Messages kept in the chat session history; older turns are dropped
+_MAX_HISTORY = 50
+
+# Seconds allowed per Gemini request, including the SDK's own retries
+_REQUEST_TIMEOUT = 30
+
+# Bytes fed to the encoding detector; a prefix is enough to identify legacy encodings
+_DETECT_PREFIX_BYTES = 16384
+
+
+def _max_concurrency(value: Optional[int]) -> int:
+    """Resolve a max_concurrency argument, defaulting to CODEREVIEW_MAX_CONCURRENCY or 8; always at least 1."""
+    if value is None:
+        env_value = os.getenv("CODEREVIEW_MAX_CONCURRENCY", "8")
+        try:
+            value = int(env_value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid CODEREVIEW_MAX_CONCURRENCY={env_value!r}, using 8")
+            value = 8
+    # A semaphore of zero would never let a request through
+    return max(1, value)
+
+
+def _settle_chat(chat: genai.ChatSession, failed: bool = False) -> None:
+    """
+    Fold the last turn into `chat`'s history and bound it to _MAX_HISTORY messages.
+    A failed or blocked turn is rewound instead, since the SDK refuses to build a history
+    (BrokenResponseError) while it is the last response; this never raises.
+    """
+    try:
+        # `last` is only set while a turn has not been folded into the history yet
+        if failed and chat.last is not None:
+            chat.rewind()
+        if len(chat.history) > _MAX_HISTORY:
+            chat.history = chat.history[-_MAX_HISTORY:]
+    except Exception as e:
+        logger.warning(f"Dropping broken chat turn: {e}")
+        try:
+            chat.rewind()
+        except Exception:
+            pass
+
+
+def _dumps_json(data: Any) -> str:
+    """Serialize `data` as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(data, indent=2)
+
+
+def _read_sync(file_path: str, size: int = -1) -> bytes:
+    """Open and read up to `size` bytes of a file in one go so callers pay a single thread hop."""
+    with open(file_path, 'rb') as f:
+        return f.read(size)
+
+
+def _decode(raw: bytes) -> str:
+    """Decode file bytes, trying strict UTF-8 first since most source files are UTF-8."""
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A bounded read can cut a multi-byte character in half at the end
+        if e.reason == 'unexpected end of data':
+            return raw[:e.start].decode('utf-8')
+    # chardet is only needed for the few files that are not UTF-8, so it is loaded here
+    try:
+        from chardet.universaldetector import UniversalDetector
+    except ImportError:
+        return raw.decode('utf-8', errors='replace')
+    detector = UniversalDetector()
+    detector.feed(raw[:_DETECT_PREFIX_BYTES])
+    detector.close()
+    encoding = detector.result['encoding'] or 'utf-8'
+    return raw.decode(encoding, errors='replace')
+
+
+def _split_chunks(code: str, chunk_size: int) -> Iterator[str]:
+    """
+    Split code into chunks of at most `chunk_size` characters.
+    Each cut is moved back to the last blank line, or failing that the last line break,
+    in the second half of the chunk so chunks do not end mid-line.
+    """
+    pos = 0
+    while pos < len(code):
+        end = min(pos + chunk_size, len(code))
+        if end < len(code):
+            floor = pos + chunk_size // 2
+            cut = code.rfind('\n\n', floor, end)
+            if cut != -1:
+                end = cut + 2
+            else:
+                cut = code.rfind('\n', floor, end)
+                if cut != -1:
+                    end = cut + 1
+        yield code[pos:end]
+        pos = end
+
+
+def _split_python_chunks(code: str, chunk_size: int) -> Iterator[str]:
+    """
+    Split Python code on top-level statement boundaries, packing small definitions
+    together up to `chunk_size`. Falls back to _split_chunks for code that does not parse
+    and for single definitions larger than `chunk_size`.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        yield from _split_chunks(code, chunk_size)
+        return
+    # ast counts \r\n, \r and \n as line breaks, so the offsets must as well
+    line_offsets = [0] + [m.end() for m in re.finditer(r'\r\n?|\n', code)]
+    # Each top-level statement starts a segment; decorators belong to their definition
+    starts = sorted({
+        line_offsets[min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])]) - 1]
+        for node in tree.body
+    } | {0})
+    bounds = starts + [len(code)]
+    buffer = ''
+    for start, end in zip(bounds, bounds[1:]):
+        segment = code[start:end]
+        if len(segment) > chunk_size:
+            if buffer:
+                yield buffer
+                buffer = ''
+            yield from _split_chunks(segment, chunk_size)
+        elif len(buffer) + len(segment) > chunk_size:
+            yield buffer
+            buffer = segment
+        else:
+            buffer += segment
+    if buffer:
+        yield buffer
+
+
+def _compile_globs(patterns: List[str]) -> re.Pattern:
+    """Compile glob patterns into a single regex so each path is matched once."""
+    return re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in patterns) or '(?!)')
+
+
+def _iter_files(repo_path: str, include_re: re.Pattern, exclude_re: re.Pattern) -> Iterator[str]:
+    """
+    Yield paths of files under `repo_path` matching `include_re` and not `exclude_re`.
+    Uses os.scandir so file/directory checks come from the directory listing without
+    extra stat calls; excluded directories are never entered.
+    """
+    pending = [(repo_path, '')]
+    while pending:
+        directory, rel_dir = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not exclude_re.match(entry.name + '/') and not exclude_re.match(rel_path + '/'):
+                        pending.append((entry.path, rel_path + '/'))
+                elif entry.is_file() and include_re.match(entry.name) and not exclude_re.match(entry.name) and not exclude_re.match(rel_path):
+                    yield entry.path
+
+
+def _discover_files(
+    repo_path: str,
+    file_patterns: List[str],
+    exclude_patterns: List[str],
+    max_files: int,
+    count_all_files: bool
+) -> Tuple[List[str], int]:
+    """Find up to `max_files` matching files under `repo_path` and the number of matches seen."""
+    selected_files = []
+    total_files_found = 0
+    for file_path in _iter_files(repo_path, _compile_globs(file_patterns), _compile_globs(exclude_patterns)):
+        total_files_found += 1
+        if len(selected_files) < max_files:
+            selected_files.append(file_path)
+        if len(selected_files) >= max_files and not count_all_files:
+            break
+    return selected_files, total_files_found
+
+
+def _content_hash(text: str) -> str:
+    """Return a short, fast digest of `text` for cache and dedup keys."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
 class CodeReviewAgent:
     """
     AI agent for code review and analysis using Google Gemini API.
     Provides repository and file analysis with robust error handling, chunking, and async file reading.
     """
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache_path: Optional[str] = None):
         """
         Initialize the code review agent.
         Args:
             api_key (str, optional): GEMINI API key. If not provided, will try to load from environment.
+            cache_path (str, optional): Path of the on-disk LLM response cache.
+                Defaults to CODEREVIEW_CACHE or ~/.codereview_cache.
         """
         load_dotenv()
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI API key is required. Set GEMINI_API_KEY environment variable.")
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model_name = 'gemini-1.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        # Short, bounded retries so one throttled request cannot stall concurrent chunk analysis
+        self._request_options = {
+            'retry': retries.Retry(initial=1, maximum=4, multiplier=2, deadline=_REQUEST_TIMEOUT),
+            'timeout': _REQUEST_TIMEOUT
+        }
         self.tools = CodeAnalysisTools()
-        self.conversation_history = []
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(message)s",
-            datefmt="[%X]",
-            handlers=[RichHandler(rich_tracebacks=True)]
-        )
+        cache_path = cache_path or os.getenv("CODEREVIEW_CACHE", "~/.codereview_cache")
+        try:
+            self._cache = shelve.open(os.path.expanduser(cache_path))
+        except Exception as e:
+            logger.warning(f"Response cache disabled, could not open {cache_path}: {e}")
+            self._cache = {}
+        # The system prompt is sent as a system instruction instead of being prepended to every message
+        self._chat_model = genai.GenerativeModel(self.model_name, system_instruction=SYSTEM_PROMPT)
+        self.chat = self.start_chat()
+
+    def start_chat(self) -> genai.ChatSession:
+        """
+        Start a new chat session with the assistant.
+        Callers that share one agent between users (e.g. the web UI) keep one session per user;
+        the agent's own `chat` is used when no session is passed.
+        Returns:
+            genai.ChatSession: A chat session with an empty history.
+        """
+        return self._chat_model.start_chat()
 
-    async def send_message(self, message: str) -> str:
+    async def send_message(self, message: str, chat: Optional[genai.ChatSession] = None) -> str:
         """
         Send a message to the assistant and get a response.
         Args:
             message (str): The message to send to the assistant
+            chat (genai.ChatSession, optional): Chat session to use, from start_chat. Defaults to the agent's own.
         Returns:
             str: The assistant's response
         """
-        self.conversation_history.append({"role": "user", "content": message})
-        full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {message}"
+        chat = chat or self.chat
         try:
-            response = self.model.generate_content(full_prompt)
+            response = await asyncio.to_thread(chat.send_message, message, request_options=self._request_options)
             assistant_response = response.text
-            self.conversation_history.append({"role": "assistant", "content": assistant_response})
-            return assistant_response
         except Exception as e:
             logger.error(f"Error calling Gemini API: {e}")
+            _settle_chat(chat, failed=True)
             return f"Error: {str(e)}"
+        _settle_chat(chat)
+        return assistant_response
 
-    async def analyze_repository(
-        self,
-        repo_path: str,
-        file_patterns: Optional[List[str]] = None,
-        exclude_patterns: Optional[List[str]] = None,
-        max_files: int = 10,
-        max_chars: int = 12000,
-        chunk_size: int = 4000
-    ) -> dict:
+    async def send_message_stream(self, message: str, chat: Optional[genai.ChatSession] = None) -> AsyncIterator[str]:
         """
-        Analyze a repository for code quality issues using Gemini LLM.
+        Send a message to the assistant and yield the response text as it is generated.
         Args:
-            repo_path (str): Path to the local repository.
-            file_patterns (list[str], optional): Glob patterns to include (e.g., ['*.py', '*.js']).
-            exclude_patterns (list[str], optional): Glob patterns to exclude (e.g., ['test_*', '*.min.js']).
-            max_files (int): Max number of files to analyze.
-            max_chars (int): Max total characters to send to LLM.
-            chunk_size (int): Max characters per LLM chunk.
+            message (str): The message to send to the assistant
+            chat (genai.ChatSession, optional): Chat session to use, from start_chat. Defaults to the agent's own.
+        Yields:
+            str: Successive pieces of the assistant's response
+        """
+        chat = chat or self.chat
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        def produce() -> bool:
+            # The SDK's streaming response is a blocking iterator, so it is drained in a worker thread.
+            # Returns whether the turn failed.
+            try:
+                for chunk in chat.send_message(message, stream=True, request_options=self._request_options):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+                return False
+            except Exception as e:
+                logger.error(f"Error calling Gemini API: {e}")
+                loop.call_soon_threadsafe(queue.put_nowait, f"Error: {str(e)}")
+                return True
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        while (text := await queue.get()) is not done:
+            yield text
+        _settle_chat(chat, failed=await producer)
+
+    def _cache_key(self, digest: str, kind: str) -> str:
+        """Build a response cache key from the prompt version, prompt kind, code digest and model."""
+        return f"{PROMPT_VERSION}|{kind}|{digest}|{self.model_name}"
+
+    async def _generate(self, prompt: str, cache_key: Optional[str] = None) -> str:
+        """
+        Run a Gemini completion off the event loop, memoizing the text by `cache_key`.
+        Args:
+            prompt (str): The full prompt to send.
+            cache_key (str, optional): Key from _cache_key; unchanged code is then served from cache.
         Returns:
-            dict: Analysis results and LLM feedback.
+            str: The response text.
         """
+        if cache_key is not None and cache_key in self._cache:
+            return self._cache[cache_key]
+        response = await asyncio.to_thread(self.model.generate_content, prompt, request_options=self._request_options)
+        text = response.text
+        if cache_key is not None:
+            self._cache[cache_key] = text
+        return text
+
+    async def _prepare_repository(
+        self,
+        repo_path: str,
+        file_patterns: Optional[List[str]],
+        exclude_patterns: Optional[List[str]],
+        max_files: int,
+        max_chars: int,
+        chunk_size: int,
+        count_all_files: bool
+    ) -> dict:
+        """Discover and read repository files and split them into LLM-sized chunks within the budget."""
         file_patterns = file_patterns or ['*.py', '*.js', '*.ts', '*.java', '*.cpp', '*.c', '*.go', '*.rs']
         exclude_patterns = exclude_patterns or ['test*', 'tests/*', '*.min.js', 'node_modules/*', 'build/*', 'dist/*']
-        all_files = []
-        for root, dirs, files in os.walk(repo_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if any(fnmatch.fnmatch(file, pat) for pat in file_patterns) and not any(fnmatch.fnmatch(file_path, pat) for pat in exclude_patterns):
-                    all_files.append(file_path)
-        selected_files = all_files[:max_files]
+        # Walking the tree is blocking I/O, keep it off the event loop
+        selected_files, total_files_found = await asyncio.to_thread(
+            _discover_files, repo_path, file_patterns, exclude_patterns, max_files, count_all_files
+        )
+        # No single file can contribute more than max_chars, so never read past that
+        read_limit = chunk_size * math.ceil(max_chars / chunk_size)
         async def read_file_async(file_path):
             try:
-                async with aiofiles.open(file_path, 'rb') as f:
-                    raw = await f.read()
-                encoding = chardet.detect(raw)['encoding'] or 'utf-8'
-                text = raw.decode(encoding, errors='replace')
+                raw = await asyncio.to_thread(_read_sync, file_path, read_limit)
+                text = _decode(raw)
                 return file_path, text, None
             except Exception as e:
                 return file_path, None, str(e)
@@ -122,40 +385,106 @@ class CodeReviewAgent:
             if err:
                 errors.append({'file': file_path, 'error': err})
                 continue
-            for i in range(0, len(code), chunk_size):
-                chunk = code[i:i+chunk_size]
+            split = _split_python_chunks if file_path.endswith('.py') else _split_chunks
+            for chunk in split(code, chunk_size):
                 if total_chars + len(chunk) > max_chars:
                     break
                 code_chunks.append({'file': file_path, 'code': chunk})
                 total_chars += len(chunk)
             if total_chars >= max_chars:
                 break
-        analyses = []
-        for chunk in code_chunks:
+        return {
+            'files_analyzed': [f for f, _, _ in file_results if _],
+            'errors': errors,
+            'chunks': code_chunks,
+            'total_files_found': total_files_found,
+            'files_selected': len(selected_files)
+        }
+
+    async def _iter_chunk_analyses(self, code_chunks: List[dict], max_concurrency: int) -> AsyncIterator[Tuple[int, dict]]:
+        """
+        Analyze chunks concurrently, yielding (chunk index, analysis) pairs as each completes.
+        Identical chunks are analyzed once and their result is yielded for every copy.
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+        # Identical chunks (license headers, generated code, copies) are sent only once
+        positions: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(code_chunks):
+            positions.setdefault(_content_hash(chunk['code']), []).append(i)
+        async def analyze_chunk(digest, chunk):
             prompt = (
                 f"You are an expert code reviewer. Analyze the following code for quality, maintainability, performance, and improvements. "
                 f"Provide a summary of issues and suggestions.\n\n"
                 f"File: {chunk['file']}\n\n"
                 f"{chunk['code']}"
             )
+            cache_key = self._cache_key(digest, 'chunk')
             try:
-                response = self.model.generate_content(prompt)
-                analyses.append({
-                    'file': chunk['file'],
-                    'analysis': response.text
-                })
+                # Cached chunks should not queue behind in-flight requests
+                if cache_key in self._cache:
+                    return digest, self._cache[cache_key], None
+                async with sem:
+                    return digest, await self._generate(prompt, cache_key), None
             except Exception as e:
-                analyses.append({
-                    'file': chunk['file'],
-                    'error': str(e)
-                })
+                return digest, None, str(e)
+        tasks = [analyze_chunk(digest, code_chunks[indices[0]]) for digest, indices in positions.items()]
+        for next_done in asyncio.as_completed(tasks):
+            digest, text, err = await next_done
+            for i in positions[digest]:
+                if err is not None:
+                    yield i, {'file': code_chunks[i]['file'], 'error': err}
+                else:
+                    yield i, {'file': code_chunks[i]['file'], 'analysis': text}
+
+    async def analyze_repository(
+        self,
+        repo_path: str,
+        file_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        max_files: int = 10,
+        max_chars: int = 12000,
+        chunk_size: int = 4000,
+        max_concurrency: Optional[int] = None,
+        count_all_files: bool = False,
+        on_result: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        Analyze a repository for code quality issues using Gemini LLM.
+        Args:
+            repo_path (str): Path to the local repository.
+            file_patterns (list[str], optional): Glob patterns to include (e.g., ['*.py', '*.js']).
+            exclude_patterns (list[str], optional): Glob patterns to exclude (e.g., ['test_*', '*.min.js']).
+            max_files (int): Max number of files to analyze.
+            max_chars (int): Max total characters to send to LLM.
+            chunk_size (int): Max characters per LLM chunk.
+            max_concurrency (int, optional): Max number of LLM requests in flight at once.
+                Defaults to CODEREVIEW_MAX_CONCURRENCY or 8.
+            count_all_files (bool): Keep walking after max_files to report the full total_files_found.
+                Otherwise discovery stops early and total_files_found counts only the files seen.
+            on_result (callable, optional): Called with each result as it becomes available: files
+                that could not be read first as {'file', 'error'}, then chunk analyses in completion
+                order as {'file', 'analysis'} or {'file', 'error'}.
+        Returns:
+            dict: Analysis results and LLM feedback.
+        """
+        plan = await self._prepare_repository(
+            repo_path, file_patterns, exclude_patterns, max_files, max_chars, chunk_size, count_all_files
+        )
+        if on_result is not None:
+            for error in plan['errors']:
+                on_result(error)
+        analyses = [None] * len(plan['chunks'])
+        async for i, analysis in self._iter_chunk_analyses(plan['chunks'], _max_concurrency(max_concurrency)):
+            analyses[i] = analysis
+            if on_result is not None:
+                on_result(analysis)
         return {
-            'files_analyzed': [f for f, _, _ in file_results if _],
-            'errors': errors,
+            'files_analyzed': plan['files_analyzed'],
+            'errors': plan['errors'],
             'analyses': analyses,
             'summary': {
-                'total_files_found': len(all_files),
-                'files_analyzed': len(selected_files),
+                'total_files_found': plan['total_files_found'],
+                'files_analyzed': plan['files_selected'],
                 'chunks_analyzed': len(analyses)
             }
         }
@@ -170,28 +499,43 @@ class CodeReviewAgent:
             dict: File analysis results and LLM feedback.
         """
         try:
-            async with aiofiles.open(file_path, 'rb') as f:
-                raw = await f.read()
-            encoding = chardet.detect(raw)['encoding'] or 'utf-8'
-            code = raw.decode(encoding, errors='replace')
-            prompt = (
-                f"You are an expert code reviewer. Analyze the following {language or 'code'} file for code quality, maintainability, performance, and improvements. "
-                f"Provide a summary of issues and suggestions.\n\n"
-                f"File: {file_path}\n\n"
-                f"{code}"
-            )
-            response = self.model.generate_content(prompt)
-            analysis = response.text
-            return {
-                "file_path": file_path,
-                "language": language,
-                "size": len(code),
-                "lines": len(code.splitlines()),
-                "llm_analysis": analysis,
-            }
+            raw = await asyncio.to_thread(_read_sync, file_path)
+            return await self._analyze_code_with_llm(_decode(raw), file_path, language)
         except Exception as e:
             return {"error": str(e)}
 
+    async def analyze_bytes_with_llm(self, data: bytes, filename: str, language: Optional[str] = None) -> dict:
+        """
+        Analyze file contents already in memory (e.g. an upload) using Gemini LLM.
+        Args:
+            data (bytes): Raw file contents.
+            filename (str): Name to report the file under (for prompt context).
+            language (str, optional): Programming language (for prompt context).
+        Returns:
+            dict: File analysis results and LLM feedback, as analyze_file_with_llm.
+        """
+        try:
+            return await self._analyze_code_with_llm(_decode(data), filename, language)
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _analyze_code_with_llm(self, code: str, file_path: str, language: Optional[str]) -> dict:
+        """Review decoded file contents with Gemini LLM (shared by the file and bytes entry points)."""
+        prompt = (
+            f"You are an expert code reviewer. Analyze the following {language or 'code'} file for code quality, maintainability, performance, and improvements. "
+            f"Provide a summary of issues and suggestions.\n\n"
+            f"File: {file_path}\n\n"
+            f"{code}"
+        )
+        analysis = await self._generate(prompt, self._cache_key(_content_hash(code), f"file:{language}"))
+        return {
+            "file_path": file_path,
+            "language": language,
+            "size": len(code),
+            "lines": len(code.splitlines()),
+            "llm_analysis": analysis,
+        }
+
     async def analyze_code_with_tools(self, code: str, language: str, task_description: Optional[str] = None) -> Dict[str, Any]:
         """Analyze code using the built-in tools and then get AI feedback.
         
@@ -216,7 +560,7 @@ class CodeReviewAgent:
         ```
         
         Technical Analysis Results:
-        {json.dumps(tool_results, indent=2)}
+        {_dumps_json(tool_results)}
         
         Please provide additional insights, suggestions, and improvements based on these results.
         Focus on:
@@ -227,7 +571,8 @@ class CodeReviewAgent:
         5. Performance enhancements
         """
         
-        ai_feedback = await self.send_message(ai_prompt)
+        # A one-off chat keeps the code and tool output out of the conversation history
+        ai_feedback = await self.send_message(ai_prompt, self.start_chat())
         
         return {
             "technical_analysis": tool_results,
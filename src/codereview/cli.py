@@ -1,16 +1,23 @@
 """Command-line interface for the AI code review agent."""
 
 import asyncio
+import functools
 import json
 import sys
 from pathlib import Path
 from typing import Optional
 
 import click
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from rich.console import Console
 from rich.table import Table
 from rich.syntax import Syntax
 from rich.panel import Panel
+from rich.markdown import Markdown
+from rich.progress import Progress, SpinnerColumn, TextColumn
 
 # Fix imports for both direct execution and package import
 try:
@@ -25,6 +32,12 @@ except ImportError:
 console = Console()
 
 
+@functools.lru_cache(maxsize=1)
+def _get_agent() -> CodeReviewAgent:
+    """Create the code review agent on first use and share it across commands."""
+    return CodeReviewAgent()
+
+
 @click.group()
 @click.version_option()
 def main():
@@ -34,7 +47,7 @@ def main():
 
 @main.command()
 @click.option('--repo', '-r', 'repo_path', help='Path to git repository to analyze')
-@click.option('--commits', '-c', help='Git commit range (e.g., HEAD~5..HEAD)')
+@click.option('--commits', '-c', help='Git commit range (e.g., HEAD~5..HEAD); reviews only the files it changed, with the static checks')
 @click.option('--output', '-o', help='Output file for results (JSON format)')
 @click.option('--verbose', '-v', is_flag=True, help='Verbose output')
 def analyze(repo_path: Optional[str], commits: Optional[str], output: Optional[str], verbose: bool):
@@ -44,27 +57,35 @@ def analyze(repo_path: Optional[str], commits: Optional[str], output: Optional[s
         sys.exit(1)
     
     try:
-        agent = CodeReviewAgent()
+        agent = _get_agent()
         
         # Run the analysis
         console.print(f"🔍 Analyzing repository: {repo_path}", style="bold blue")
         if commits:
+            # A commit range is reviewed file by file from its diffs
             console.print(f"📝 Commit range: {commits}", style="blue")
-        
-        # Run async function
-        result = asyncio.run(agent.analyze_repository(repo_path, commits))
-        
-        if "error" in result:
-            console.print(f"❌ Analysis failed: {result['error']}", style="bold red")
-            sys.exit(1)
-        
-        # Display results
-        _display_analysis_results(result, verbose)
+            result = asyncio.run(agent.tools.analyze_code_changes(repo_path, commits))
+            if "error" in result:
+                console.print(f"❌ Analysis failed: {result['error']}", style="bold red")
+                sys.exit(1)
+            _display_change_analysis_results(result, verbose)
+        else:
+            # Render each analysis as soon as it completes
+            analyses = []
+            with Progress(SpinnerColumn(), TextColumn("{task.description}"), console=console, transient=True) as progress:
+                task = progress.add_task("Reviewing code...", total=None)
+                def show_result(analysis):
+                    _display_chunk_analysis(analysis)
+                    analyses.append(analysis)
+                    progress.advance(task)
+                result = asyncio.run(agent.analyze_repository(repo_path, on_result=show_result))
+            
+            # Display summary
+            _display_analysis_results(analyses, verbose)
         
         # Save to file if requested
         if output:
-            with open(output, 'w') as f:
-                json.dump(result, f, indent=2)
+            _write_json(output, result)
             console.print(f"💾 Results saved to: {output}", style="bold green")
     
     except Exception as e:
@@ -79,7 +100,7 @@ def analyze(repo_path: Optional[str], commits: Optional[str], output: Optional[s
 def analyze_file(file_path: str, language: Optional[str], output: Optional[str]):
     """Analyze a single file for code quality issues."""
     try:
-        agent = CodeReviewAgent()
+        agent = _get_agent()
         
         console.print(f"🔍 Analyzing file: {file_path}", style="bold blue")
         
@@ -95,8 +116,7 @@ def analyze_file(file_path: str, language: Optional[str], output: Optional[str])
         
         # Save to file if requested
         if output:
-            with open(output, 'w') as f:
-                json.dump(result, f, indent=2)
+            _write_json(output, result)
             console.print(f"💾 Results saved to: {output}", style="bold green")
     
     except Exception as e:
@@ -121,7 +141,7 @@ def suggest_algorithms(code: Optional[str], language: str, task: Optional[str],
             console.print("❌ No code provided.", style="bold red")
             sys.exit(1)
         
-        agent = CodeReviewAgent()
+        agent = _get_agent()
         
         console.print(f"🚀 Analyzing algorithms for {language} code...", style="bold blue")
         
@@ -137,8 +157,44 @@ def suggest_algorithms(code: Optional[str], language: str, task: Optional[str],
         
         # Save to file if requested
         if output:
-            with open(output, 'w') as f:
-                json.dump(result, f, indent=2)
+            _write_json(output, result)
+            console.print(f"💾 Results saved to: {output}", style="bold green")
+    
+    except Exception as e:
+        console.print(f"❌ Error: {e}", style="bold red")
+        sys.exit(1)
+
+
+@main.command()
+@click.option('--language', '-l', help='Programming language (auto-detected per file if not provided)')
+@click.option('--output', '-o', help='Output file for results (JSON format)')
+def batch(language: Optional[str], output: Optional[str]):
+    """Analyze many files in one run, reading file paths from stdin (one per line)."""
+    try:
+        file_paths = [line.strip() for line in sys.stdin if line.strip()]
+        if not file_paths:
+            console.print("❌ No file paths provided on stdin.", style="bold red")
+            sys.exit(1)
+        
+        agent = _get_agent()
+        
+        console.print(f"🔍 Analyzing {len(file_paths)} files...", style="bold blue")
+        
+        async def analyze_all():
+            return await asyncio.gather(*[agent.tools.analyze_file(path, language) for path in file_paths])
+        
+        # One event loop and one agent for the whole batch
+        results = asyncio.run(analyze_all())
+        
+        for result in results:
+            if "error" in result:
+                console.print(f"❌ Analysis failed: {result['error']}", style="bold red")
+            else:
+                _display_file_analysis_results(result)
+        
+        # Save to file if requested
+        if output:
+            _write_json(output, results)
             console.print(f"💾 Results saved to: {output}", style="bold green")
     
     except Exception as e:
@@ -150,7 +206,7 @@ def suggest_algorithms(code: Optional[str], language: str, task: Optional[str],
 def interactive():
     """Start interactive mode for chat-based code review."""
     try:
-        agent = CodeReviewAgent()
+        agent = _get_agent()
         asyncio.run(agent.run())
     except Exception as e:
         console.print(f"❌ Error: {e}", style="bold red")
@@ -179,14 +235,55 @@ def web(port: int):
         sys.exit(1)
 
 
-def _display_analysis_results(result: dict, verbose: bool):
+def _write_json(output: str, data) -> None:
+    """Write results as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        Path(output).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def _display_chunk_analysis(analysis: dict):
+    """Display a single streamed repository analysis."""
+    console.print(f"\n📄 {analysis.get('file', 'Unknown')}", style="bold cyan")
+    if "analysis" in analysis:
+        console.print(Markdown(analysis["analysis"]))
+    else:
+        console.print(f"❌ {analysis.get('error', 'Unknown error')}", style="bold red")
+
+
+def _display_analysis_results(analyses: list, verbose: bool):
     """Display repository analysis results."""
     console.print("\n" + "="*60, style="bold blue")
     console.print("📊 ANALYSIS RESULTS", style="bold blue")
     console.print("="*60, style="bold blue")
     
+    # Summary
+    errors = [a for a in analyses if "error" in a]
+    files = {}
+    for analysis in analyses:
+        files[analysis["file"]] = files.get(analysis["file"], 0) + 1
+    console.print(f"📁 Files analyzed: {len(files)}", style="green")
+    console.print(f"💡 Analyses: {len(analyses) - len(errors)}", style="blue")
+    console.print(f"⚠️  Errors: {len(errors)}", style="yellow")
+    
+    # Files analyzed
+    if verbose and files:
+        console.print("\n📋 FILES ANALYZED:", style="bold")
+        for file_path, count in files.items():
+            console.print(f"  • {file_path} ({count} chunks)", style="cyan")
+
+
+def _display_change_analysis_results(result: dict, verbose: bool):
+    """Display commit range analysis results."""
+    console.print("\n" + "="*60, style="bold blue")
+    console.print("📊 ANALYSIS RESULTS", style="bold blue")
+    console.print("="*60, style="bold blue")
+    
     # Summary
     summary = result.get("summary", {})
+    console.print(f"📝 Commits analyzed: {result.get('commits_analyzed', 0)}", style="green")
     console.print(f"📁 Files analyzed: {summary.get('total_files', 0)}", style="green")
     console.print(f"⚠️  Issues found: {summary.get('total_issues', 0)}", style="yellow")
     console.print(f"💡 Suggestions: {summary.get('total_suggestions', 0)}", style="blue")
@@ -196,18 +293,10 @@ def _display_analysis_results(result: dict, verbose: bool):
     if files:
         console.print("\n📋 FILES ANALYZED:", style="bold")
         for file_info in files:
-            console.print(f"  • {file_info.get('file_path', 'Unknown')}", style="cyan")
+            console.print(f"  • {file_info.get('file_path', 'Unknown')} ({file_info.get('commit', '')})", style="cyan")
             if verbose:
-                issues = file_info.get("issues", [])
-                if issues:
-                    console.print(f"    Issues: {len(issues)}", style="yellow")
-    
-    # Algorithm suggestions
-    suggestions = result.get("algorithm_suggestions", [])
-    if suggestions:
-        console.print("\n🚀 ALGORITHM SUGGESTIONS:", style="bold")
-        for suggestion in suggestions:
-            console.print(f"  • {suggestion}", style="green")
+                for issue in file_info.get("issues", []):
+                    console.print(f"    - {issue.get('description', 'No description')}", style="yellow")
 
 
 def _display_file_analysis_results(result: dict):
@@ -1,5 +1,8 @@
 """Prompts for the AI code review agent."""
 
+# Bump whenever a review prompt changes so cached LLM responses are invalidated
+PROMPT_VERSION = "1"
+
 SYSTEM_PROMPT = """You are an expert AI code reviewer and algorithm optimization specialist. Your role is to:
 
 1. **Analyze Code Quality**: Review code for readability, performance, security, maintainability, and best practices
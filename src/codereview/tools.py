@@ -1,17 +1,464 @@
 """Tools for code analysis and algorithm suggestions."""
 
+from __future__ import annotations
+
 import ast
+import asyncio
 import logging
+import mmap
+import multiprocessing
+import operator
+import os
 import re
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, NamedTuple, Optional, Set, Tuple, Union
 
-import git
 from rich.console import Console
 
+if TYPE_CHECKING:
+    import git
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 console = Console()
 
+# Priority/severity levels shared by every issue and suggestion
+PRIO_CRITICAL = sys.intern("critical")
+PRIO_HIGH = sys.intern("high")
+PRIO_MEDIUM = sys.intern("medium")
+PRIO_LOW = sys.intern("low")
+
+
+# Kind of the last line containing 'for', as reported by _scan_loop_lines
+_LOOP_NONE = 0
+_LOOP_RANGE = 1
+_LOOP_NESTED = 2
+
+# Code shorter than this many characters is scanned in pure Python
+_JIT_THRESHOLD = 64 * 1024
+
+
+def _scan_loop_lines(buf) -> Tuple[int, int]:
+    """
+    Byte-level version of the _analyze_complexity line heuristic for numba.
+    For every line containing 'for', the line counts as a range loop if it also contains
+    'in' and 'range', otherwise as a nested loop. Returns the kind of the last such line
+    and the number of nested-loop lines.
+    """
+    n = len(buf)
+    last_loop = _LOOP_NONE
+    nested_loops = 0
+    has_for = False
+    has_in = False
+    has_range = False
+    for i in range(n + 1):
+        if i == n or buf[i] == 10:  # '\n'
+            if has_for:
+                if has_in and has_range:
+                    last_loop = _LOOP_RANGE
+                else:
+                    last_loop = _LOOP_NESTED
+                    nested_loops += 1
+            has_for = False
+            has_in = False
+            has_range = False
+        elif buf[i] == 102:  # 'f'
+            if i + 2 < n and buf[i + 1] == 111 and buf[i + 2] == 114:  # 'or'
+                has_for = True
+        elif buf[i] == 105:  # 'i'
+            if i + 1 < n and buf[i + 1] == 110:  # 'n'
+                has_in = True
+        elif buf[i] == 114:  # 'r'
+            if i + 4 < n and buf[i + 1] == 97 and buf[i + 2] == 110 and buf[i + 3] == 103 and buf[i + 4] == 101:  # 'ange'
+                has_range = True
+    return last_loop, nested_loops
+
+
+# Compiled scanner over UTF-8 text, built by _loop_line_scanner; False once numba is found missing
+_scan_loop_lines_jit = None
+
+
+def _loop_line_scanner():
+    """
+    Return a numba-compiled _scan_loop_lines that takes a str, or None when numba is not installed.
+    numba is slow to import and only large inputs use it, so it is loaded on first use.
+    """
+    global _scan_loop_lines_jit
+    if _scan_loop_lines_jit is None:
+        try:
+            import numba
+            import numpy as np
+        except ImportError:
+            _scan_loop_lines_jit = False
+        else:
+            kernel = numba.njit(cache=True)(_scan_loop_lines)
+            _scan_loop_lines_jit = lambda code: kernel(np.frombuffer(code.encode('utf-8'), dtype=np.uint8))
+    return _scan_loop_lines_jit or None
+
+
+class _PatternSet:
+    """Named groups of literal patterns, matched in one pass over the code."""
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self.names = list(patterns)
+        # One alternation with a group per name, used when Hyperscan is not installed
+        self.regex = re.compile('|'.join(
+            f"(?P<{name}>{'|'.join(re.escape(literal) for literal in literals)})"
+            for name, literals in patterns.items()
+        ))
+        self.database = None
+        if hyperscan is not None:
+            expressions = []
+            ids = []
+            for index, literals in enumerate(patterns.values()):
+                for literal in literals:
+                    expressions.append(re.escape(literal).encode('utf-8'))
+                    ids.append(index)
+            self.database = hyperscan.Database()
+            self.database.compile(
+                expressions=expressions,
+                ids=ids,
+                elements=len(expressions),
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions)
+            )
+        # Hyperscan scratch space must not be shared by concurrent scans, so each thread gets its own
+        self._local = threading.local()
+
+    def scratch(self):
+        """Return this thread's Hyperscan scratch space for `database`."""
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self.database)
+        return scratch
+
+
+def _compile_patterns(patterns: Dict[str, List[str]]) -> _PatternSet:
+    """Compile named literal patterns for _scan_patterns."""
+    return _PatternSet(patterns)
+
+
+def _scan_patterns(pattern: _PatternSet, code: str) -> Set[str]:
+    """Return the names of the pattern groups that occur in `code`, scanning it once."""
+    found = set()
+    if pattern.database is not None:
+        def on_match(index, start, end, flags, context):
+            found.add(pattern.names[index])
+        pattern.database.scan(code.encode('utf-8'), match_event_handler=on_match, scratch=pattern.scratch())
+        return found
+    for match in pattern.regex.finditer(code):
+        found.add(match.lastgroup)
+        if len(found) == len(pattern.names):
+            break
+    return found
+
+
+_LANG_MAP = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.java': 'java',
+    '.cpp': 'cpp',
+    '.c': 'c',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.php': 'php',
+    '.rb': 'ruby'
+}
+
+
+@lru_cache(maxsize=32)
+def _ext_to_lang(extension: str) -> str:
+    """Map a lower-cased file extension (with the dot) to a language name."""
+    return _LANG_MAP.get(extension, 'unknown')
+
+
+# Files larger than this many bytes are read through mmap
+_MMAP_THRESHOLD = 256 * 1024
+
+# Analyze commit ranges with at least this many changed code files in a process pool
+_PROCESS_POOL_MIN_CHANGES = 32
+
+# Start method for the process pool's workers
+_POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Extensions (without the dot) of changed files worth analyzing
+_CODE_EXTENSIONS = frozenset({'py', 'js', 'java', 'cpp', 'c', 'go', 'rs'})
+
+
+def _has_code_extension(path: str) -> bool:
+    """Check a path's extension against _CODE_EXTENSIONS without building a Path."""
+    _, dot, extension = path.rpartition('.')
+    return bool(dot) and extension in _CODE_EXTENSIONS
+
+
+class _FileChange(NamedTuple):
+    """One changed path from `git diff-tree --raw`, with hex object names of both sides."""
+    change_type: str
+    path: str
+    a_sha: str
+    b_sha: str
+
+
+# Which side of a change holds the content to analyze, by diff-tree status letter.
+# Renames never appear (--no-renames lists them as a delete plus an add).
+_SHA_FOR_CHANGE = {
+    'A': operator.attrgetter('b_sha'),  # Added
+    'M': operator.attrgetter('b_sha'),  # Modified
+    'T': operator.attrgetter('b_sha'),  # Type changed
+    'D': operator.attrgetter('a_sha'),  # Deleted
+}
+
+# Mode git uses for submodule entries, whose object is a commit in another repository
+_GITLINK_MODE = '160000'
+
+
+def _open_repo(repository_path: str) -> git.Repo:
+    """Open the git repository at `repository_path`."""
+    # GitPython is slow to import, so it is only loaded for git analyses
+    import git
+    return git.Repo(repository_path)
+
+
+def _parse_raw_diff(output: str) -> List[_FileChange]:
+    """Parse NUL-separated `git diff-tree -z --raw --no-renames` output, keeping only code files."""
+    changes = []
+    fields = output.split('\x00')
+    # Records are ':<a mode> <b mode> <a sha> <b sha> <status>' followed by the path
+    for i in range(0, len(fields) - 1, 2):
+        path = fields[i + 1]
+        if not _has_code_extension(path):
+            continue
+        a_mode, b_mode, a_sha, b_sha, status = fields[i].lstrip(':').split(' ')
+        if _GITLINK_MODE in (a_mode, b_mode):
+            continue
+        changes.append(_FileChange(status, path, a_sha, b_sha))
+    return changes
+
+
+_JS_ALGORITHM_PATTERNS = _compile_patterns({
+    "for_loop": ["for (let i = 0; i < array.length; i++)"],
+    "chaining": ["array.filter().map()", "array.map().filter()"],
+    "deep_clone": ["JSON.parse(JSON.stringify("],
+})
+
+_JAVA_ALGORITHM_PATTERNS = _compile_patterns({
+    "for_loop": ["for (int i = 0; i < list.size(); i++)"],
+    "new_list": ["new ArrayList<>()"],
+    "add_call": ["add("],
+})
+
+_JS_FILE_PATTERNS = _compile_patterns({
+    "var_usage": ["var "],
+    "console_log": ["console.log"],
+})
+
+
+def _read_source(path: Path) -> str:
+    """Read a UTF-8 source file, decoding large files straight from a memory map."""
+    if path.stat().st_size <= _MMAP_THRESHOLD:
+        return path.read_text(encoding='utf-8')
+    with path.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        code = str(mm, 'utf-8')
+    # Match the universal-newline translation done by text-mode reads
+    if '\r' in code:
+        code = code.replace('\r\n', '\n').replace('\r', '\n')
+    return code
+
+
+# Issue kinds found by the AST checks, indexed by the small-int codes below:
+# (type, description template, priority/severity)
+_ISSUE_KINDS = (
+    ("nested_loops", "Nested loops detected - consider using itertools or list comprehensions", PRIO_HIGH),
+    ("list_comprehension", "Complex list comprehension - consider using generator expressions", PRIO_MEDIUM),
+    ("function_call", "Consider using {}() more efficiently", PRIO_LOW),
+    ("too_many_parameters", "Function '{}' has too many parameters", PRIO_MEDIUM),
+    ("large_class", "Class '{}' is too large", PRIO_MEDIUM),
+)
+_KIND_NESTED_LOOPS = 0
+_KIND_LIST_COMPREHENSION = 1
+_KIND_FUNCTION_CALL = 2
+_KIND_TOO_MANY_PARAMETERS = 3
+_KIND_LARGE_CLASS = 4
+
+
+def _materialize_issues(kinds: List[int], lines: List[Any], names: List[Optional[str]],
+                        level_key: str = "priority") -> List[Dict[str, Any]]:
+    """Build issue dicts from the parallel kind/line/name lists collected during a traversal."""
+    issues = []
+    for kind, line, name in zip(kinds, lines, names):
+        issue_type, description, level = _ISSUE_KINDS[kind]
+        issues.append({
+            "type": issue_type,
+            "description": description.format(name) if name is not None else description,
+            level_key: level,
+            "line": line
+        })
+    return issues
+
+
+class _FullVisitor(ast.NodeVisitor):
+    """Collect algorithm suggestions and definition issues for Python code in one tree traversal."""
+
+    def __init__(self):
+        self.for_depth = 0
+        self.function_depth = 0
+        # Findings are kept as parallel lists and turned into dicts by _materialize_issues
+        self.kinds = []
+        self.lines = []
+        self.names = []
+        self.issue_kinds = []
+        self.issue_lines = []
+        self.issue_names = []
+
+    def _add(self, kind: int, node: ast.AST, name: Optional[str] = None):
+        self.kinds.append(kind)
+        self.lines.append(getattr(node, 'lineno', 'unknown'))
+        self.names.append(name)
+
+    def _add_issue(self, kind: int, node: ast.AST, name: Optional[str] = None):
+        self.issue_kinds.append(kind)
+        self.issue_lines.append(getattr(node, 'lineno', 'unknown'))
+        self.issue_names.append(name)
+
+    def visit_For(self, node: ast.AST):
+        self.for_depth += 1
+        if self.for_depth >= 2:
+            self._add(_KIND_NESTED_LOOPS, node)
+        self.generic_visit(node)
+        self.for_depth -= 1
+
+    visit_AsyncFor = visit_For
+
+    def visit_ListComp(self, node: ast.ListComp):
+        # Check for inefficient list comprehensions
+        if len(node.generators) > 1:
+            self._add(_KIND_LIST_COMPREHENSION, node)
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        # Check for inefficient function calls
+        if isinstance(node.func, ast.Name) and node.func.id in ['sorted', 'list', 'tuple']:
+            self._add(_KIND_FUNCTION_CALL, node, node.func.id)
+        self.generic_visit(node)
+
+    # Definition checks apply to module- and class-level definitions, not ones nested in functions
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        if self.function_depth == 0 and len(node.args.args) > 5:
+            self._add_issue(_KIND_TOO_MANY_PARAMETERS, node, node.name)
+        self._visit_function(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
+        self._visit_function(node)
+
+    def _visit_function(self, node: ast.AST):
+        self.function_depth += 1
+        self.generic_visit(node)
+        self.function_depth -= 1
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        if self.function_depth == 0 and len(node.body) > 20:
+            self._add_issue(_KIND_LARGE_CLASS, node, node.name)
+        self.generic_visit(node)
+
+
+@lru_cache(maxsize=128)
+def _analyze_python_cached(code: Union[str, bytes]) -> Union[_FullVisitor, tuple]:
+    """
+    Parse and traverse Python source once per distinct string or bytes. A syntax error is
+    cached as its args tuple rather than the exception, whose traceback would grow on re-raise.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return e.args
+    visitor = _FullVisitor()
+    visitor.visit(tree)
+    return visitor
+
+
+def _analyze_python_combined(code: Union[str, bytes]) -> _FullVisitor:
+    """
+    Run the single traversal behind both _analyze_python_algorithms and _analyze_python_file.
+    The (read-only) result is cached per source so both analyses share it; raises SyntaxError.
+    """
+    visitor = _analyze_python_cached(code)
+    if isinstance(visitor, tuple):
+        raise SyntaxError(*visitor)
+    return visitor
+
+
+def _python_file_issues(code: Union[str, bytes]) -> Dict[str, Any]:
+    """Check Python source for quality issues (the core of _analyze_python_file)."""
+    issues = []
+    suggestions = []
+    
+    try:
+        visitor = _analyze_python_combined(code)
+        
+        # Check for common issues
+        issues.extend(_materialize_issues(visitor.issue_kinds, visitor.issue_lines, visitor.issue_names,
+                                          level_key="severity"))
+    
+    except SyntaxError as e:
+        issues.append({
+            "type": "syntax_error",
+            "description": f"Syntax error: {str(e)}",
+            "severity": PRIO_CRITICAL,
+            "line": "unknown"
+        })
+    
+    return {"issues": issues, "suggestions": suggestions}
+
+
+def _javascript_file_issues(code: str) -> Dict[str, Any]:
+    """Check JavaScript source for quality issues (the core of _analyze_javascript_file)."""
+    issues = []
+    suggestions = []
+    
+    # Simple pattern matching for common issues, in one scan over the code
+    found = _scan_patterns(_JS_FILE_PATTERNS, code)
+    if "var_usage" in found:
+        suggestions.append({
+            "type": "var_usage",
+            "description": "Consider using 'let' or 'const' instead of 'var'",
+            "severity": PRIO_LOW
+        })
+    
+    if "console_log" in found:
+        suggestions.append({
+            "type": "console_log",
+            "description": "Remove console.log statements before production",
+            "severity": PRIO_LOW
+        })
+    
+    return {"issues": issues, "suggestions": suggestions}
+
+
+# Languages _analyze_blob_worker has analyzers for; other content yields no findings
+_BLOB_LANGUAGES = frozenset({'python', 'javascript'})
+
+
+def _analyze_blob_worker(raw: bytes, language: str) -> Dict[str, Any]:
+    """
+    Analyze raw file content, decoding it only for the analyzers that need text.
+    Takes and returns plain data only, so it can run in a worker process.
+    """
+    if language == "python":
+        # ast.parse takes bytes directly (and honours coding declarations)
+        return _python_file_issues(raw)
+    elif language == "javascript":
+        return _javascript_file_issues(raw.decode('utf-8'))
+    return {}
+
 
 class CodeAnalysisTools:
     """Tools for analyzing code and suggesting improvements."""
@@ -26,26 +473,99 @@ class CodeAnalysisTools:
             "best_practices": "Language-specific best practices",
             "algorithm_efficiency": "Algorithm complexity and efficiency"
         }
+        self._git_lock = threading.Lock()
+
+    @staticmethod
+    def _resolve_commits(repo: git.Repo, commit_range: Optional[str]) -> List[git.Commit]:
+        """Return the commits to analyze for `commit_range`, defaulting to the last commit."""
+        if commit_range:
+            return list(repo.iter_commits(commit_range))
+        return [repo.head.commit]
+
+    async def _iter_file_changes(self, repo: git.Repo, commits: List[git.Commit],
+                                 include_content: bool = False) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Analyze the changed files of `commits` concurrently, yielding (change index, analysis) as each completes."""
+        # Changes are analyzed concurrently; blob reads run in worker threads, parsing in worker
+        # threads or, for large runs, worker processes
+        sem = asyncio.Semaphore((os.cpu_count() or 1) * 2)
+        async def analyze_change(i, change, commit, pool):
+            async with sem:
+                return i, await self._analyze_file_change(repo, change, commit, include_content, pool)
+        
+        changes = []
+        for commit in commits:
+            subject = commit.message.partition('\n')[0][:80]
+            console.print(f"📝 Analyzing commit: {commit.hexsha[:8]} - {subject}", style="blue")
+            
+            # Get the changed paths for this commit as one raw diff-tree listing; only code files
+            # are kept, and their blobs are read later straight from the object database
+            if commit.parents:
+                raw_diff = repo.git.diff_tree('-r', '-z', '--raw', '--no-renames', commit.parents[0].hexsha, commit.hexsha)
+            else:
+                # Initial commit
+                raw_diff = repo.git.diff_tree('-r', '-z', '--raw', '--no-renames', '--root', '--no-commit-id', commit.hexsha)
+            
+            for change in _parse_raw_diff(raw_diff):
+                changes.append((change, commit))
+        
+        # Parsing enough files to outweigh process start-up is spread over all cores. Workers are
+        # not forked, since forking copies the event loop's threads and locks into them
+        pool = None
+        if len(changes) >= _PROCESS_POOL_MIN_CHANGES:
+            pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                       mp_context=multiprocessing.get_context(_POOL_START_METHOD))
+        tasks = [analyze_change(i, change, commit, pool) for i, (change, commit) in enumerate(changes)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, file_analysis = await next_done
+                if file_analysis:
+                    yield i, file_analysis
+        finally:
+            if pool is not None:
+                # Joining the workers blocks, so it is kept off the event loop
+                await asyncio.to_thread(pool.shutdown, cancel_futures=True)
+
+    async def analyze_code_changes_stream(self, repository_path: str, commit_range: Optional[str] = None,
+                                          include_content: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze git changes like analyze_code_changes, yielding each file analysis as it completes.
+        
+        Consumers that handle one file at a time never hold the whole result set in memory.
+        
+        Args:
+            repository_path: Path to the git repository
+            commit_range: Git commit range to analyze
+            include_content: Include each file's decoded content in its analysis
+            
+        Yields:
+            One file analysis per changed code file, in completion order
+            
+        Raises:
+            ValueError: If the commit range contains no commits
+        """
+        repo = _open_repo(repository_path)
+        commits = self._resolve_commits(repo, commit_range)
+        if not commits:
+            raise ValueError("No commits found in the specified range")
+        async for _, file_analysis in self._iter_file_changes(repo, commits, include_content):
+            yield file_analysis
 
-    async def analyze_code_changes(self, repository_path: str, commit_range: Optional[str] = None) -> Dict[str, Any]:
+    async def analyze_code_changes(self, repository_path: str, commit_range: Optional[str] = None,
+                                   include_content: bool = False) -> Dict[str, Any]:
         """Analyze git changes for code quality issues.
         
         Args:
             repository_path: Path to the git repository
             commit_range: Git commit range to analyze
+            include_content: Include each file's decoded content in its analysis
             
         Returns:
             Analysis results
         """
         try:
-            repo = git.Repo(repository_path)
+            repo = _open_repo(repository_path)
             
             # Determine commit range
-            if commit_range:
-                commits = list(repo.iter_commits(commit_range))
-            else:
-                # Default to last commit
-                commits = [repo.head.commit]
+            commits = self._resolve_commits(repo, commit_range)
             
             if not commits:
                 return {"error": "No commits found in the specified range"}
@@ -59,24 +579,16 @@ class CodeAnalysisTools:
                 "algorithm_suggestions": []
             }
             
-            for commit in commits:
-                console.print(f"📝 Analyzing commit: {commit.hexsha[:8]} - {commit.message.split()[0]}", style="blue")
-                
-                # Get diff for this commit
-                if commit.parents:
-                    diff = commit.diff(commit.parents[0])
-                else:
-                    # Initial commit
-                    diff = commit.diff(git.NULL_TREE)
-                
-                for change in diff:
-                    if change.a_path and change.a_path.endswith(('.py', '.js', '.java', '.cpp', '.c', '.go', '.rs')):
-                        file_analysis = await self._analyze_file_change(change, commit)
-                        if file_analysis:
-                            analysis_results["files_analyzed"].append(file_analysis)
+            # Collect the streamed analyses back into diff order, counting issues as they arrive
+            files_analyzed = {}
+            counts = Counter()
+            async for i, file_analysis in self._iter_file_changes(repo, commits, include_content):
+                files_analyzed[i] = file_analysis
+                self._count_file_analysis(counts, file_analysis)
+            analysis_results["files_analyzed"] = [files_analyzed[i] for i in sorted(files_analyzed)]
             
             # Generate summary
-            analysis_results["summary"] = self._generate_analysis_summary(analysis_results)
+            analysis_results["summary"] = self._generate_analysis_summary(analysis_results, counts)
             
             return analysis_results
             
@@ -116,7 +628,7 @@ class CodeAnalysisTools:
                 suggestions["suggestions"].append({
                     "type": "general",
                     "description": "Consider analyzing time and space complexity",
-                    "priority": "medium"
+                    "priority": PRIO_MEDIUM
                 })
             
             return suggestions
@@ -144,8 +656,7 @@ class CodeAnalysisTools:
             if not language:
                 language = self._detect_language(path)
             
-            with open(path, 'r', encoding='utf-8') as f:
-                code = f.read()
+            code = _read_source(path)
             
             analysis = {
                 "file_path": str(path),
@@ -170,35 +681,31 @@ class CodeAnalysisTools:
             logger.error(f"Error analyzing file: {e}")
             return {"error": f"Failed to analyze file: {str(e)}"}
 
-    async def _analyze_file_change(self, change: git.diff.Diff, commit: git.Commit) -> Optional[Dict[str, Any]]:
+    async def _analyze_file_change(self, repo: git.Repo, change: _FileChange, commit: git.Commit,
+                                   include_content: bool = False,
+                                   pool: Optional[Executor] = None) -> Optional[Dict[str, Any]]:
         """Analyze a single file change."""
         try:
             file_analysis = {
-                "file_path": change.a_path or change.b_path,
+                "file_path": change.path,
                 "change_type": change.change_type,
                 "commit": commit.hexsha[:8],
-                "commit_message": commit.message.split('\n')[0],
+                "commit_message": commit.message.partition('\n')[0],
                 "issues": [],
                 "algorithm_suggestions": []
             }
             
             # Get the changed content
-            if change.change_type == 'A':  # Added
-                content = change.b_blob.data_stream.read().decode('utf-8')
-                file_analysis["content"] = content
-            elif change.change_type == 'M':  # Modified
-                content = change.b_blob.data_stream.read().decode('utf-8')
-                file_analysis["content"] = content
-            elif change.change_type == 'D':  # Deleted
-                content = change.a_blob.data_stream.read().decode('utf-8')
-                file_analysis["content"] = content
+            sha_for_change = _SHA_FOR_CHANGE.get(change.change_type)
+            if sha_for_change is None:
+                return None
+            raw = await asyncio.to_thread(self._read_blob, repo, sha_for_change(change))
+            if include_content:
+                file_analysis["content"] = raw.decode('utf-8')
             
             # Analyze the content
-            language = self._detect_language(Path(file_analysis["file_path"]))
-            if language == "python":
-                file_analysis.update(await self._analyze_python_content(content))
-            elif language == "javascript":
-                file_analysis.update(await self._analyze_javascript_content(content))
+            language = self._detect_language(change.path)
+            file_analysis.update(await self._analyze_bytes(raw, language, pool))
             
             return file_analysis
             
@@ -206,48 +713,27 @@ class CodeAnalysisTools:
             logger.error(f"Error analyzing file change: {e}")
             return None
 
+    def _read_blob(self, repo: git.Repo, sha: str) -> bytes:
+        """Read a blob's raw bytes; GitPython's object database is not safe for concurrent reads."""
+        with self._git_lock:
+            return repo.odb.stream(bytes.fromhex(sha)).read()
+
+    async def _analyze_bytes(self, raw: bytes, language: str, pool: Optional[Executor] = None) -> Dict[str, Any]:
+        """Analyze raw file content in `pool`, or in a worker thread when no pool is given."""
+        # Content without an analyzer is not worth shipping to a worker
+        if language not in _BLOB_LANGUAGES:
+            return {}
+        return await asyncio.get_running_loop().run_in_executor(pool, _analyze_blob_worker, raw, language)
+
     async def _analyze_python_algorithms(self, code: str, task_description: Optional[str] = None) -> Dict[str, Any]:
         """Analyze Python code for algorithm improvements."""
         suggestions = []
         improved_algorithms = []
         
         try:
-            # Parse the code
-            tree = ast.parse(code)
-            
-            # Look for common inefficient patterns
-            for node in ast.walk(tree):
-                if isinstance(node, ast.For):
-                    # Check for nested loops
-                    for child in ast.walk(node):
-                        if isinstance(child, ast.For) and child != node:
-                            suggestions.append({
-                                "type": "nested_loops",
-                                "description": "Nested loops detected - consider using itertools or list comprehensions",
-                                "priority": "high",
-                                "line": getattr(node, 'lineno', 'unknown')
-                            })
-                
-                elif isinstance(node, ast.ListComp):
-                    # Check for inefficient list comprehensions
-                    if len(node.generators) > 1:
-                        suggestions.append({
-                            "type": "list_comprehension",
-                            "description": "Complex list comprehension - consider using generator expressions",
-                            "priority": "medium",
-                            "line": getattr(node, 'lineno', 'unknown')
-                        })
-                
-                elif isinstance(node, ast.Call):
-                    # Check for inefficient function calls
-                    if isinstance(node.func, ast.Name):
-                        if node.func.id in ['sorted', 'list', 'tuple']:
-                            suggestions.append({
-                                "type": "function_call",
-                                "description": f"Consider using {node.func.id}() more efficiently",
-                                "priority": "low",
-                                "line": getattr(node, 'lineno', 'unknown')
-                            })
+            # Parse the code and look for common inefficient patterns in a single pass over the tree
+            visitor = _analyze_python_combined(code)
+            suggestions.extend(_materialize_issues(visitor.kinds, visitor.lines, visitor.names))
             
             # Suggest specific improvements based on patterns
             if "sort" in code.lower() or "sorted" in code:
@@ -270,7 +756,7 @@ class CodeAnalysisTools:
             suggestions.append({
                 "type": "syntax_error",
                 "description": "Code contains syntax errors",
-                "priority": "critical"
+                "priority": PRIO_CRITICAL
             })
         
         return {
@@ -283,26 +769,27 @@ class CodeAnalysisTools:
         suggestions = []
         improved_algorithms = []
         
-        # Look for common inefficient patterns
-        if "for (let i = 0; i < array.length; i++)" in code:
+        # Look for common inefficient patterns in one scan over the code
+        found = _scan_patterns(_JS_ALGORITHM_PATTERNS, code)
+        if "for_loop" in found:
             suggestions.append({
                 "type": "for_loop",
                 "description": "Traditional for loop - consider using forEach, map, or for...of",
-                "priority": "medium"
+                "priority": PRIO_MEDIUM
             })
         
-        if "array.filter().map()" in code or "array.map().filter()" in code:
+        if "chaining" in found:
             suggestions.append({
                 "type": "chaining",
                 "description": "Multiple array operations - consider combining or using reduce",
-                "priority": "medium"
+                "priority": PRIO_MEDIUM
             })
         
-        if "JSON.parse(JSON.stringify(" in code:
+        if "deep_clone" in found:
             suggestions.append({
                 "type": "deep_clone",
                 "description": "Inefficient deep cloning - consider structuredClone() or lodash.cloneDeep",
-                "priority": "medium"
+                "priority": PRIO_MEDIUM
             })
         
         return {
@@ -315,19 +802,20 @@ class CodeAnalysisTools:
         suggestions = []
         improved_algorithms = []
         
-        # Look for common inefficient patterns
-        if "for (int i = 0; i < list.size(); i++)" in code:
+        # Look for common inefficient patterns in one scan over the code
+        found = _scan_patterns(_JAVA_ALGORITHM_PATTERNS, code)
+        if "for_loop" in found:
             suggestions.append({
                 "type": "for_loop",
                 "description": "Traditional for loop - consider using enhanced for loop or streams",
-                "priority": "medium"
+                "priority": PRIO_MEDIUM
             })
         
-        if "new ArrayList<>()" in code and "add(" in code:
+        if "new_list" in found and "add_call" in found:
             suggestions.append({
                 "type": "list_creation",
                 "description": "Consider using Arrays.asList() or List.of() for immutable lists",
-                "priority": "low"
+                "priority": PRIO_LOW
             })
         
         return {
@@ -343,94 +831,45 @@ class CodeAnalysisTools:
             "notes": []
         }
         
-        # Simple heuristics for complexity analysis
-        lines = code.split('\n')
-        for line in lines:
-            if any(keyword in line for keyword in ['for', 'while', 'forEach']):
-                if 'for' in line and 'in' in line and 'range' in line:
-                    complexity["time_complexity"] = "O(n)"
-                elif 'for' in line and 'for' in line:  # Nested loops
-                    complexity["time_complexity"] = "O(n²)"
-                    complexity["notes"].append("Nested loops detected")
+        # Large inputs go through the compiled byte scanner when numba is installed
+        scanner = _loop_line_scanner() if len(code) >= _JIT_THRESHOLD else None
+        if scanner is not None:
+            last_loop, nested_loops = scanner(code)
+            if last_loop == _LOOP_NESTED:
+                complexity["time_complexity"] = "O(n²)"
+            complexity["notes"].extend(["Nested loops detected"] * nested_loops)
+            return complexity
+        
+        # Simple heuristics for complexity analysis; only lines containing 'for' affect the result,
+        # so jump from one such line to the next instead of testing every line
+        pos = code.find('for')
+        while pos != -1:
+            start = code.rfind('\n', 0, pos) + 1
+            end = code.find('\n', pos)
+            if end == -1:
+                end = len(code)
+            line = code[start:end]
+            if 'in' in line and 'range' in line:
+                complexity["time_complexity"] = "O(n)"
+            else:  # Nested loops
+                complexity["time_complexity"] = "O(n²)"
+                complexity["notes"].append("Nested loops detected")
+            pos = code.find('for', end)
         
         return complexity
 
-    def _detect_language(self, file_path: Path) -> str:
+    @staticmethod
+    def _detect_language(file_path: Union[str, Path]) -> str:
         """Detect the programming language based on file extension."""
-        extension = file_path.suffix.lower()
-        language_map = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.ts': 'typescript',
-            '.java': 'java',
-            '.cpp': 'cpp',
-            '.c': 'c',
-            '.go': 'go',
-            '.rs': 'rust',
-            '.php': 'php',
-            '.rb': 'ruby'
-        }
-        return language_map.get(extension, 'unknown')
+        return _ext_to_lang(os.path.splitext(file_path)[1].lower())
 
-    async def _analyze_python_file(self, code: str) -> Dict[str, Any]:
+    async def _analyze_python_file(self, code: Union[str, bytes]) -> Dict[str, Any]:
         """Analyze a Python file for quality issues."""
-        issues = []
-        suggestions = []
-        
-        try:
-            tree = ast.parse(code)
-            
-            # Check for common issues
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    if len(node.args.args) > 5:
-                        issues.append({
-                            "type": "too_many_parameters",
-                            "description": f"Function '{node.name}' has too many parameters",
-                            "severity": "medium",
-                            "line": getattr(node, 'lineno', 'unknown')
-                        })
-                
-                elif isinstance(node, ast.ClassDef):
-                    if len(node.body) > 20:
-                        issues.append({
-                            "type": "large_class",
-                            "description": f"Class '{node.name}' is too large",
-                            "severity": "medium",
-                            "line": getattr(node, 'lineno', 'unknown')
-                        })
-        
-        except SyntaxError as e:
-            issues.append({
-                "type": "syntax_error",
-                "description": f"Syntax error: {str(e)}",
-                "severity": "critical",
-                "line": "unknown"
-            })
-        
-        return {"issues": issues, "suggestions": suggestions}
+        return await asyncio.to_thread(_python_file_issues, code)
 
     async def _analyze_javascript_file(self, code: str) -> Dict[str, Any]:
         """Analyze a JavaScript file for quality issues."""
-        issues = []
-        suggestions = []
-        
-        # Simple pattern matching for common issues
-        if "var " in code:
-            suggestions.append({
-                "type": "var_usage",
-                "description": "Consider using 'let' or 'const' instead of 'var'",
-                "severity": "low"
-            })
-        
-        if "console.log" in code:
-            suggestions.append({
-                "type": "console_log",
-                "description": "Remove console.log statements before production",
-                "severity": "low"
-            })
-        
-        return {"issues": issues, "suggestions": suggestions}
+        return _javascript_file_issues(code)
 
     async def _analyze_generic_file(self, code: str, language: str) -> Dict[str, Any]:
         """Analyze a generic file for quality issues."""
@@ -443,32 +882,35 @@ class CodeAnalysisTools:
             issues.append({
                 "type": "large_file",
                 "description": "File is very large - consider splitting into smaller modules",
-                "severity": "medium"
+                "severity": PRIO_MEDIUM
             })
         
         return {"issues": issues, "suggestions": suggestions}
 
-    async def _analyze_python_content(self, content: str) -> Dict[str, Any]:
-        """Analyze Python content for issues and suggestions."""
-        return await self._analyze_python_file(content)
-
-    async def _analyze_javascript_content(self, content: str) -> Dict[str, Any]:
-        """Analyze JavaScript content for issues and suggestions."""
-        return await self._analyze_javascript_file(content)
+    @staticmethod
+    def _count_file_analysis(counts: Counter, file_analysis: Dict[str, Any]) -> None:
+        """Add one file analysis to the running issue/suggestion/severity counts."""
+        issues = file_analysis.get("issues", [])
+        counts["issues"] += len(issues)
+        counts["suggestions"] += len(file_analysis.get("suggestions", []))
+        for issue in issues:
+            counts[issue.get("severity")] += 1
 
-    def _generate_analysis_summary(self, results: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a summary of the analysis results."""
-        total_issues = sum(len(file.get("issues", [])) for file in results.get("files_analyzed", []))
-        total_suggestions = sum(len(file.get("suggestions", [])) for file in results.get("files_analyzed", []))
+    def _generate_analysis_summary(self, results: Dict[str, Any], counts: Optional[Counter] = None) -> Dict[str, Any]:
+        """Generate a summary of the analysis results from counts kept while they were collected."""
+        if counts is None:
+            counts = Counter()
+            for file_analysis in results.get("files_analyzed", []):
+                self._count_file_analysis(counts, file_analysis)
         
         return {
             "total_files": len(results.get("files_analyzed", [])),
-            "total_issues": total_issues,
-            "total_suggestions": total_suggestions,
+            "total_issues": counts["issues"],
+            "total_suggestions": counts["suggestions"],
             "severity_breakdown": {
-                "critical": 0,
-                "high": 0,
-                "medium": 0,
-                "low": 0
+                PRIO_CRITICAL: counts[PRIO_CRITICAL],
+                PRIO_HIGH: counts[PRIO_HIGH],
+                PRIO_MEDIUM: counts[PRIO_MEDIUM],
+                PRIO_LOW: counts[PRIO_LOW]
             }
         } 
\ No newline at end of file
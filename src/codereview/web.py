@@ -1,27 +1,96 @@
 """Streamlit web interface for the AI code review agent."""
 
+from __future__ import annotations
+
 import asyncio
+import atexit
+import hashlib
 import json
 import tempfile
-from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 import os
-import git
 import re
 import shutil
 import stat
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import streamlit as st
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import HtmlFormatter
 from dotenv import load_dotenv
-load_dotenv()
-print("GEMINI_API_KEY:", os.getenv("GEMINI_API_KEY"))
-try:
+
+# Pygments and the agent (with the Gemini SDK) are slow to import, so they are
+# imported where first used instead of on every script run
+if TYPE_CHECKING:
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexer import Lexer
     from .agent import CodeReviewAgent
-except ImportError:
-    from codereview.agent import CodeReviewAgent
+
+
+class _MissingAPIKeyError(Exception):
+    """Raised when GEMINI_API_KEY is not set, so st.cache_data does not keep the missing value."""
+
+
+@st.cache_data(show_spinner=False)
+def _load_api_key() -> str:
+    """Load .env and read GEMINI_API_KEY once per process, once it has been configured."""
+    load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise _MissingAPIKeyError()
+    return api_key
+
+
+def _api_key() -> Optional[str]:
+    """Return GEMINI_API_KEY, or None while it is not configured; .env is re-read until it is."""
+    try:
+        return _load_api_key()
+    except _MissingAPIKeyError:
+        return None
+
+
+@st.cache_resource
+def _get_agent(api_key: str) -> CodeReviewAgent:
+    """
+    Create the code review agent once per process instead of on every rerun.
+    The agent is shared by all sessions; chat state is kept per session (see _interactive_chat_page).
+    """
+    try:
+        from .agent import CodeReviewAgent
+    except ImportError:
+        from codereview.agent import CodeReviewAgent
+    return CodeReviewAgent(api_key)
+
+
+@st.cache_resource
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start one background event loop per process, shared by every rerun."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="codereview-loop", daemon=True).start()
+    return loop
+
+
+def _run(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def _sync_iter(agen):
+    """Iterate an async generator from the script thread, stepping it on the shared event loop."""
+    loop = _get_loop()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+@st.cache_resource
+def _cleanup_pool() -> ThreadPoolExecutor:
+    """Start the worker threads that delete cloned repositories; pending deletions finish at exit."""
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="codereview-cleanup")
+    atexit.register(pool.shutdown, wait=True)
+    return pool
 
 
 def on_rm_error(func, path, exc_info):
@@ -38,8 +107,63 @@ def run_streamlit(port: int = 8501):
     sys.exit(stcli.main())
 
 
+_CSS = """
+<style>
+.main-header {
+    font-size: 3rem;
+    font-weight: bold;
+    text-align: center;
+    margin-bottom: 2rem;
+    background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+}
+.metric-card {
+    background-color: #f0f2f6;
+    padding: 1rem;
+    border-radius: 0.5rem;
+    border-left: 4px solid #667eea;
+}
+.issue-card {
+    background-color: #fff3cd;
+    border: 1px solid #ffeaa7;
+    border-radius: 0.5rem;
+    padding: 1rem;
+    margin: 0.5rem 0;
+}
+.suggestion-card {
+    background-color: #d1ecf1;
+    border: 1px solid #bee5eb;
+    border-radius: 0.5rem;
+    padding: 1rem;
+    margin: 0.5rem 0;
+}
+</style>
+"""
+
+
 def main():
     """Main Streamlit application."""
+    api_key, analysis_type = _render_shell()
+    
+    # Main content; each page is a fragment, so its own widgets (including chat input)
+    # rerun only that page and not the shell
+    if analysis_type == "Repository Analysis":
+        _repository_analysis_page(api_key)
+    elif analysis_type == "File Analysis":
+        _file_analysis_page(api_key)
+    elif analysis_type == "Algorithm Suggestions":
+        _algorithm_suggestions_page(api_key)
+    elif analysis_type == "Interactive Chat":
+        _interactive_chat_page(api_key)
+
+
+def _render_shell() -> Tuple[str, str]:
+    """
+    Render the page config, CSS, header and sidebar, returning the API key and chosen analysis type.
+    This runs only on full reruns (e.g. switching pages); it is not a fragment itself because
+    fragments cannot write to the sidebar.
+    """
     st.set_page_config(
         page_title="AI Code Review Agent",
         page_icon="🤖",
@@ -47,47 +171,17 @@ def main():
         initial_sidebar_state="expanded"
     )
     
-    # Custom CSS
-    st.markdown("""
-    <style>
-    .main-header {
-        font-size: 3rem;
-        font-weight: bold;
-        text-align: center;
-        margin-bottom: 2rem;
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #667eea;
-    }
-    .issue-card {
-        background-color: #fff3cd;
-        border: 1px solid #ffeaa7;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 0.5rem 0;
-    }
-    .suggestion-card {
-        background-color: #d1ecf1;
-        border: 1px solid #bee5eb;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 0.5rem 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # Custom CSS. It is emitted on every full rerun: Streamlit drops elements a rerun does not
+    # re-emit, so sending it only once per session would lose the styling after the first rerun.
+    # Page interactions rerun only their fragment and do not resend it.
+    st.markdown(_CSS, unsafe_allow_html=True)
     
     # Header
     st.markdown('<h1 class="main-header">🤖 AI Code Review Agent</h1>', unsafe_allow_html=True)
     st.markdown("### Intelligent code analysis and algorithm optimization")
     
     # Check for API key in environment
-    api_key = os.getenv("GEMINI_API_KEY")
+    api_key = _api_key()
     if not api_key:
         st.error("❌ GEMINI_API_KEY not found in environment variables. Please set it in your .env file.")
         st.stop()
@@ -106,24 +200,19 @@ def main():
         )
         
         st.markdown("---")
-        st.markdown("### 📊 Features")
-        st.markdown("• **Multi-language Support**")
-        st.markdown("• **Quality Analysis**")
-        st.markdown("• **Algorithm Optimization**")
-        st.markdown("• **Git Integration**")
-        st.markdown("• **Real-time Feedback**")
-    
-    # Main content
-    if analysis_type == "Repository Analysis":
-        _repository_analysis_page(api_key)
-    elif analysis_type == "File Analysis":
-        _file_analysis_page(api_key)
-    elif analysis_type == "Algorithm Suggestions":
-        _algorithm_suggestions_page(api_key)
-    elif analysis_type == "Interactive Chat":
-        _interactive_chat_page(api_key)
+        st.markdown(
+            "### 📊 Features\n"
+            "• **Multi-language Support**  \n"
+            "• **Quality Analysis**  \n"
+            "• **Algorithm Optimization**  \n"
+            "• **Git Integration**  \n"
+            "• **Real-time Feedback**"
+        )
+    
+    return api_key, analysis_type
 
 
+@st.fragment
 def _repository_analysis_page(api_key: str):
     """Repository analysis page."""
     st.header("📁 Repository Analysis")
@@ -153,10 +242,10 @@ def _repository_analysis_page(api_key: str):
         temp_dir = None
         try:
             with st.spinner("🔍 Analyzing repository..."):
-                agent = CodeReviewAgent(api_key)
+                agent = _get_agent(api_key)
                 if is_github_url(repo_path):
                     try:
-                        temp_dir = clone_github_repo(repo_path)
+                        temp_dir = clone_github_repo(repo_path, commit_range)
                         analysis_path = temp_dir
                     except Exception as e:
                         st.error(f"❌ Failed to clone repo: {e}")
@@ -164,7 +253,7 @@ def _repository_analysis_page(api_key: str):
                 else:
                     analysis_path = repo_path
                 
-                result = asyncio.run(agent.analyze_repository(analysis_path))
+                result = _run(agent.analyze_repository(analysis_path))
                 
                 # Defensive check
                 if isinstance(result, str):
@@ -177,14 +266,15 @@ def _repository_analysis_page(api_key: str):
                 
                 _display_repository_results(result)
                 
-                # After analysis, clean up if needed
-                if is_github_url(repo_path):
-                    shutil.rmtree(temp_dir, onerror=on_rm_error)
-                
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
+        finally:
+            # After analysis, clean up the clone in the background so the page is not held up
+            if temp_dir:
+                _cleanup_pool().submit(shutil.rmtree, temp_dir, onerror=on_rm_error)
 
 
+@st.fragment
 def _file_analysis_page(api_key: str):
     """File analysis page."""
     st.header("📄 File Analysis")
@@ -216,20 +306,27 @@ def _file_analysis_page(api_key: str):
         
         with st.spinner("🔍 Analyzing file..."):
             try:
-                agent = CodeReviewAgent(api_key)
+                agent = _get_agent(api_key)
                 
                 if uploaded_file:
-                    # Create temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                        tmp_file.write(uploaded_file.getvalue())
-                        tmp_file_path = tmp_file.name
-                    
-                    result = asyncio.run(agent.analyze_file_with_llm(tmp_file_path, language if language != "Auto-detect" else None))
+                    # Re-clicking with the same upload reuses this session's last result outright
+                    digest = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+                    upload_key = (digest, uploaded_file.name, language)
+                    if st.session_state.get("last_file_key") == upload_key:
+                        _display_file_results(st.session_state.last_file_result)
+                        return
                     
-                    # Clean up
-                    Path(tmp_file_path).unlink()
+                    # Re-analyzing an identical upload is answered from the cache
+                    try:
+                        result = _analyze_upload(api_key, digest, uploaded_file.name, uploaded_file,
+                                                 language if language != "Auto-detect" else None)
+                    except _AnalysisError as e:
+                        result = {"error": str(e)}
+                    else:
+                        st.session_state.last_file_key = upload_key
+                        st.session_state.last_file_result = result
                 else:
-                    result = asyncio.run(agent.analyze_file_with_llm(file_path, language if language != "Auto-detect" else None))
+                    result = _run(agent.analyze_file_with_llm(file_path, language if language != "Auto-detect" else None))
                 
                 if "error" in result:
                     st.error(f"❌ Analysis failed: {result['error']}")
@@ -241,6 +338,25 @@ def _file_analysis_page(api_key: str):
                 st.error(f"❌ Error: {str(e)}")
 
 
+class _AnalysisError(Exception):
+    """Raised for failed analyses so st.cache_data does not keep them."""
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _analyze_upload(api_key: str, digest: str, filename: str, _uploaded_file, language: Optional[str]) -> dict:
+    """
+    Analyze an uploaded file, cached on its SHA-256 digest, name and language.
+    The file object itself is left out of the cache key (leading underscore).
+    """
+    # The upload is already in memory, so it goes to the agent as bytes without a temp file
+    result = _run(_get_agent(api_key).analyze_bytes_with_llm(_uploaded_file.getvalue(), filename, language))
+    
+    if "error" in result:
+        raise _AnalysisError(result["error"])
+    return result
+
+
+@st.fragment
 def _algorithm_suggestions_page(api_key: str):
     """Algorithm suggestions page."""
     st.header("🚀 Algorithm Suggestions")
@@ -276,8 +392,8 @@ def _algorithm_suggestions_page(api_key: str):
         
         with st.spinner("🚀 Analyzing algorithms..."):
             try:
-                agent = CodeReviewAgent(api_key)
-                result = asyncio.run(agent.tools.suggest_algorithms(code, language, task_description))
+                agent = _get_agent(api_key)
+                result = _run(agent.tools.suggest_algorithms(code, language, task_description))
                 
                 if "error" in result:
                     st.error(f"❌ Analysis failed: {result['error']}")
@@ -289,6 +405,7 @@ def _algorithm_suggestions_page(api_key: str):
                 st.error(f"❌ Error: {str(e)}")
 
 
+@st.fragment
 def _interactive_chat_page(api_key: str):
     """Interactive chat page."""
     st.header("💬 Interactive Chat")
@@ -310,20 +427,21 @@ def _interactive_chat_page(api_key: str):
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Get AI response, rendered as it streams in
         with st.chat_message("assistant"):
-            with st.spinner("🤖 Thinking..."):
-                try:
-                    agent = CodeReviewAgent(api_key)
-                    response = asyncio.run(agent.send_message(prompt))
-                    
-                    st.markdown(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    
-                except Exception as e:
-                    error_msg = f"❌ Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+            try:
+                agent = _get_agent(api_key)
+                # The agent is shared by all sessions, but each browser session has its own chat
+                if "chat" not in st.session_state:
+                    st.session_state.chat = agent.start_chat()
+                response = st.write_stream(_sync_iter(agent.send_message_stream(prompt, st.session_state.chat)))
+                
+                st.session_state.messages.append({"role": "assistant", "content": response})
+                
+            except Exception as e:
+                error_msg = f"❌ Error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
 
 
 def _display_repository_results(result: dict):
@@ -338,12 +456,15 @@ def _display_repository_results(result: dict):
             st.error(f"{err['file']}: {err['error']}")
     
     st.write("### Code Review Analyses")
-    for analysis in result.get("analyses", []):
-        st.subheader(f"File: {analysis['file']}")
-        if 'analysis' in analysis:
-            st.markdown(analysis['analysis'])
-        else:
-            st.error(f"Error: {analysis['error']}")
+    # Successful analyses go out as one markdown element rather than two elements per file
+    analyses = result.get("analyses", [])
+    st.markdown("\n\n".join(
+        f"### File: {analysis['file']}\n\n{analysis['analysis']}"
+        for analysis in analyses if 'analysis' in analysis
+    ))
+    for analysis in analyses:
+        if 'analysis' not in analysis:
+            st.error(f"{analysis['file']}: {analysis['error']}")
 
 
 def _display_file_results(result: dict):
@@ -387,17 +508,39 @@ def _display_file_results(result: dict):
             st.info(f"• {suggestion.get('description', 'No description')}")
 
 
+# Pygments objects are reused across reruns instead of being rebuilt for every display.
+# Streamlit re-executes this script on each rerun, so they are kept with st.cache_resource
+# rather than in module globals or lru_cache.
+@st.cache_resource
+def _formatter() -> HtmlFormatter:
+    """Return the shared HTML formatter."""
+    from pygments.formatters import HtmlFormatter
+    return HtmlFormatter()
+
+
+# Lower-cased names of the languages offered in the UI (with the "cpp" alias for C++)
+_HIGHLIGHT_LANGUAGES = ("python", "javascript", "typescript", "java", "c++", "cpp", "c", "go", "rust", "php", "ruby")
+
+
+@st.cache_resource
+def _lexers() -> Dict[str, Lexer]:
+    """Build the Pygments lexers for the languages offered in the UI, keyed by lower-cased name."""
+    from pygments.lexers import get_lexer_by_name
+    return {name: get_lexer_by_name(name) for name in _HIGHLIGHT_LANGUAGES}
+
+
 def _display_algorithm_results(result: dict, original_code: str, language: str):
     """Display algorithm analysis results."""
     st.success("✅ Algorithm analysis complete!")
     
     # Original code
     st.subheader("📝 Original Code")
-    try:
-        lexer = get_lexer_by_name(language.lower())
-        highlighted_code = highlight(original_code, lexer, HtmlFormatter())
+    lexer = _lexers().get(language.lower())
+    if lexer is not None:
+        from pygments import highlight
+        highlighted_code = highlight(original_code, lexer, _formatter())
         st.markdown(highlighted_code, unsafe_allow_html=True)
-    except:
+    else:
         st.code(original_code, language=language.lower())
     
     # Current complexity
@@ -435,13 +578,42 @@ def _display_algorithm_results(result: dict, original_code: str, language: str):
                     st.code(algo["example"], language=language.lower())
 
 
+_GITHUB_URL_RE = re.compile(r'https://github\.com/[^/]+/[^/\s]+')
+
+
 def is_github_url(url):
-    return re.match(r'https://github.com/.+/.+', url)
+    return _GITHUB_URL_RE.match(url) is not None
+
 
+def _clone_depth(commit_range: Optional[str]) -> Optional[int]:
+    """History depth needed for `commit_range`, or None when it cannot be told from the range."""
+    if not commit_range:
+        return 1
+    match = re.fullmatch(r'HEAD~(\d+)(?:\.\.HEAD)?', commit_range.strip())
+    if match:
+        return int(match.group(1)) + 1
+    return None
 
-def clone_github_repo(repo_url):
+
+def clone_github_repo(repo_url, commit_range: Optional[str] = None):
+    if shutil.which("git") is None:
+        raise RuntimeError("git is not installed or not on PATH")
+    # Fetch only the history the analysis needs; objects outside it are left on the server.
+    # Plain `git clone` is enough here, the analysis only reads the checked-out files.
+    depth = _clone_depth(commit_range)
+    command = ["git", "clone", "--single-branch"]
+    if depth is not None:
+        command.append(f"--depth={depth}")
+    command += ["--filter=tree:0" if depth == 1 else "--filter=blob:none", repo_url]
     temp_dir = tempfile.mkdtemp()
-    git.Repo.clone_from(repo_url, temp_dir)
+    try:
+        completed = subprocess.run(command + [temp_dir], stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    except BaseException:
+        shutil.rmtree(temp_dir, onerror=on_rm_error)
+        raise
+    if completed.returncode != 0:
+        shutil.rmtree(temp_dir, onerror=on_rm_error)
+        raise RuntimeError(completed.stderr.strip() or f"git clone exited with status {completed.returncode}")
     return temp_dir
 
 